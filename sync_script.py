@@ -1,19 +1,69 @@
-import json
+import functools
+import hashlib
 import logging
+import orjson
 import os
+import re
 import requests
 import semver
+import stat
 import sys
-from typing import Dict, List, Tuple
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor, wait
+from requests.adapters import HTTPAdapter
+from typing import Collection, Dict, List, Optional, Tuple
+from urllib3.util.retry import Retry
 
-# Set up logging
+# Set up logging; the format never uses process/thread info, so skip collecting it for every record
+logging.logProcesses = False
+logging.logThreads = False
+logging.logMultiprocessing = False
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 
+# Parses a semver string; memoized since the same few versions recur across files
+@functools.lru_cache(maxsize=None)
+def parse_version(version: str) -> semver.VersionInfo:
+    return semver.VersionInfo.parse(version)
+
+ZERO_VERSION = parse_version('0.0.0')
+
+# Hashes a JSON-compatible value independently of key order
+def canonical_hash(obj) -> str:
+    return hashlib.blake2b(orjson.dumps(obj, option=orjson.OPT_SORT_KEYS), digest_size=16).hexdigest()
+
+# Defers serializing a log argument to JSON until the record is actually emitted
+class LazyJSON:
+    def __init__(self, obj):
+        self.obj = obj
+
+    def __str__(self) -> str:
+        return orjson.dumps(self.obj, option=orjson.OPT_INDENT_2).decode()
+
+# A file queued for syncing: (filename, format_data, file_version, allowed_instances, formatted_custom_format, format_hash)
+PendingFormat = Tuple[str, Dict, semver.VersionInfo, Optional[Collection[str]], Dict, str]
+
+# Picks cfSync_version out of a file's raw bytes without parsing the rest of it
+VERSION_FIELD_PATTERN = re.compile(rb'"cfSync_version"\s*:\s*"([^"]+)"')
+# How much of each file to search for cfSync_version; the field sits near the top in practice
+VERSION_SCAN_BYTES = 4096
+
+# The process umask; reading it means briefly changing it, so do that once before any threads start
+UMASK = os.umask(0)
+os.umask(UMASK)
+
+# Key in the version file holding the per-instance content hashes of synced formats
+HASHES_KEY = 'cfSync_hashes'
+
 # Manages version information for custom formats
 class VersionManager:
     def __init__(self, version_file: str = 'version.json'):
         self.version_file = version_file
+        self.hashes: Dict[str, Dict[str, str]] = {}
         self.versions = self.load_versions()
+        self.dirty = False
+        # Instances sync concurrently and record their hashes from worker threads
+        self.lock = threading.Lock()
 
     def load_versions(self) -> Dict[str, semver.VersionInfo]:
         if not os.path.exists(self.version_file):
@@ -21,10 +71,11 @@ class VersionManager:
             return {}
             
         try:
-            with open(self.version_file, 'r') as f:
-                version_data = json.load(f)
-                return {k: semver.VersionInfo.parse(v) for k, v in version_data.items()}
-        except json.JSONDecodeError:
+            with open(self.version_file, 'rb') as f:
+                version_data = orjson.loads(f.read())
+                self.hashes = version_data.pop(HASHES_KEY, {})
+                return {k: parse_version(v) for k, v in version_data.items()}
+        except orjson.JSONDecodeError:
             logging.warning(f"Malformed {self.version_file}, starting fresh")
             return {}
         except Exception as e:
@@ -33,40 +84,184 @@ class VersionManager:
 
     def save_versions(self):
         try:
-            with open(self.version_file, 'w') as f:
-                json.dump({k: str(v) for k, v in self.versions.items()}, f, indent=4)
+            version_data = {k: str(v) for k, v in self.versions.items()}
+            if self.hashes:
+                version_data[HASHES_KEY] = self.hashes
+            # Write to a temporary file first so an interrupted save never leaves a truncated file behind
+            version_dir = os.path.dirname(os.path.abspath(self.version_file))
+            with tempfile.NamedTemporaryFile('wb', dir=version_dir, suffix='.tmp', delete=False) as f:
+                f.write(orjson.dumps(version_data, option=orjson.OPT_INDENT_2))
+            # Temporary files are created 0600; keep the mode the file already had, or the usual default for a new one
+            try:
+                mode = stat.S_IMODE(os.stat(self.version_file).st_mode)
+            except FileNotFoundError:
+                mode = 0o666 & ~UMASK
+            os.chmod(f.name, mode)
+            os.replace(f.name, self.version_file)
         except Exception as e:
             logging.error(f"Error saving versions: {str(e)}")
+            if 'f' in locals() and os.path.exists(f.name):
+                os.remove(f.name)
             raise
 
+    # Writes pending version changes to disk, if there are any
+    def flush(self):
+        with self.lock:
+            if self.dirty:
+                self.save_versions()
+                self.dirty = False
+
     def cleanup_versions(self, existing_files: List[str]):
-        removed = set(self.versions.keys()) - set(existing_files)
+        existing = frozenset(existing_files)
+        removed = (self.versions.keys() | self.hashes.keys()) - existing
         if removed:
-            logging.info(f"Removing versions for non-existent files: {', '.join(removed)}")
-            self.versions = {k: v for k, v in self.versions.items() if k in existing_files}
-            self.save_versions()
+            logging.info("Removing versions for non-existent files: %s", ', '.join(removed))
+            # Usually only a handful of files go away, so drop their entries in place
+            for filename in removed:
+                self.versions.pop(filename, None)
+                self.hashes.pop(filename, None)
+            self.dirty = True
 
+    # Records a new version in memory; written to disk by flush()
+    def set_version(self, filename: str, new_version: semver.VersionInfo):
+        with self.lock:
+            self.versions[filename] = new_version
+            self.dirty = True
+
+    # Records a new version and writes it to disk immediately
     def update_version(self, filename: str, new_version: semver.VersionInfo):
-        self.versions[filename] = new_version
-        self.save_versions()
+        self.set_version(filename, new_version)
+        self.flush()
+
+    # Returns the content hash last synced for a file to an instance, if any
+    def get_hash(self, filename: str, instance_name: str) -> Optional[str]:
+        return self.hashes.get(filename, {}).get(instance_name)
+
+    # Records the content hash synced for a file to an instance; written to disk by flush()
+    def set_hash(self, filename: str, instance_name: str, content_hash: str):
+        with self.lock:
+            self.hashes.setdefault(filename, {})[instance_name] = content_hash
+            self.dirty = True
+
+# Shared by all instances for sending quality profile updates in parallel
+PROFILE_UPDATE_EXECUTOR = ThreadPoolExecutor(max_workers=8)
+
+# Request bodies are serialized with orjson, so the content type has to be set explicitly
+JSON_HEADERS = {'Content-Type': 'application/json'}
 
 # Handles API communication with Radarr/Sonarr instances
 class APIClient:
-    def __init__(self, base_url: str, api_key: str):
-        self.base_url = base_url
+    def __init__(self, base_url: str, api_key: str, cache_dir: Optional[str] = None):
+        # Endpoint URLs are built once; a trailing slash on the configured URL would otherwise yield '//api/v3/...'
+        self.base_url = base_url.rstrip('/')
+        self.url_customformat = f'{self.base_url}/api/v3/customformat'
+        self.url_qualityprofile = f'{self.base_url}/api/v3/qualityprofile'
         self.api_key = api_key
+        self.cache_dir = cache_dir
         self.session = requests.Session()
         self.session.headers.update({'X-Api-Key': self.api_key})
 
+        # Keep connections alive between requests and retry transient server errors
+        retry = Retry(total=3, backoff_factor=0.3, status_forcelist=[429, 500, 502, 503, 504], raise_on_status=False)
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=32, max_retries=retry)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+
+        # Last ETag and body seen per URL, for conditional GETs; backed by cache_dir across runs when set
+        self.conditional_cache: Dict[str, Optional[Tuple[str, bytes]]] = {}
+
+        # Custom formats (by name) and quality profiles, fetched on first use and kept up to date by our own writes
+        self.formats_by_name: Optional[Dict[str, Dict]] = None
+        self.profiles: Optional[List[Dict]] = None
+        # Each cached profile's formatItems indexed by format id
+        self.format_items_by_profile: Dict[int, Dict[int, Dict]] = {}
+        # Guards the profile cache, which concurrent profile updates write to
+        self.profiles_lock = threading.Lock()
+
+    # GETs a URL, sending the last ETag seen for it so an unchanged body is reused on 304 Not Modified
+    def get_conditional(self, url: str) -> bytes:
+        if url not in self.conditional_cache:
+            self.conditional_cache[url] = self.load_cached_response(url)
+        cached = self.conditional_cache[url]
+        headers = {'If-None-Match': cached[0]} if cached else {}
+        response = self.session.get(url, headers=headers)
+        if response.status_code == 304 and cached:
+            return cached[1]
+
+        response.raise_for_status()
+        if 'ETag' in response.headers:
+            self.conditional_cache[url] = (response.headers['ETag'], response.content)
+            self.save_cached_response(url, response.headers['ETag'], response.content)
+        return response.content
+
+    # Path of the on-disk cache entry for a URL; named by a hash alone, since instance URLs are secrets
+    def cached_response_path(self, url: str) -> str:
+        return os.path.join(self.cache_dir, canonical_hash(url))
+
+    # Loads the ETag and body cached on disk for a URL by a previous run, if any
+    def load_cached_response(self, url: str) -> Optional[Tuple[str, bytes]]:
+        if not self.cache_dir:
+            return None
+        try:
+            with open(self.cached_response_path(url), 'rb') as f:
+                etag, content = f.read().split(b'\n', 1)
+            return etag.decode(), content
+        except FileNotFoundError:
+            return None
+        except Exception as e:
+            logging.warning(f"Ignoring unreadable response cache for {url}: {str(e)}")
+            return None
+
+    # Stores the ETag (first line) and body for a URL so the next run can make a conditional GET
+    def save_cached_response(self, url: str, etag: str, content: bytes):
+        if not self.cache_dir:
+            return
+        try:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            with tempfile.NamedTemporaryFile('wb', dir=self.cache_dir, suffix='.tmp', delete=False) as f:
+                f.write(etag.encode() + b'\n' + content)
+            os.replace(f.name, self.cached_response_path(url))
+        except Exception as e:
+            logging.warning(f"Could not write response cache for {url}: {str(e)}")
+            if 'f' in locals() and os.path.exists(f.name):
+                os.remove(f.name)
+
+    # Drops the cached custom formats so the next lookup fetches them again
+    def invalidate_formats(self):
+        self.formats_by_name = None
+
+    # Drops the cached quality profiles so the next lookup fetches them again
+    def invalidate_profiles(self):
+        with self.profiles_lock:
+            self.profiles = None
+            self.format_items_by_profile = {}
+
+    # Indexes a quality profile's format items by format id
+    def index_format_items(self, profile: Dict):
+        self.format_items_by_profile[profile['id']] = {item['format']: item for item in profile.get('formatItems', [])}
+
+    # Returns a cached quality profile's format item for a custom format, or None if it has none
+    def get_format_item(self, profile_id: int, format_id: int) -> Optional[Dict]:
+        return self.format_items_by_profile.get(profile_id, {}).get(format_id)
+
+    # Returns a custom format by name, or None if the instance doesn't have it
+    def get_custom_format(self, name: str) -> Optional[Dict]:
+        if self.formats_by_name is None:
+            self.get_custom_formats()
+        return self.formats_by_name.get(name)
+
     # Retrieves all custom formats from the instance
     def get_custom_formats(self) -> List[Dict]:
+        if self.formats_by_name is not None:
+            return list(self.formats_by_name.values())
+
         try:
-            response = self.session.get(f'{self.base_url}/api/v3/customformat')
-            response.raise_for_status()
-            return response.json()
+            custom_formats = orjson.loads(self.get_conditional(self.url_customformat))
+            self.formats_by_name = {f['name']: f for f in custom_formats}
+            return custom_formats
         except requests.RequestException as e:
             logging.error(f"Error fetching custom formats: {e}")
-            logging.error(f"Response content: {response.text if 'response' in locals() else 'No response'}")
+            logging.error(f"Response content: {e.response.text if e.response is not None else 'No response'}")
             raise
 
     # Updates an existing custom format or creates a new one
@@ -74,15 +269,21 @@ class APIClient:
         try:
             # Determine if we're updating an existing format or creating a new one
             if 'id' in custom_format:
-                url = f'{self.base_url}/api/v3/customformat/{custom_format["id"]}'
-                response = self.session.put(url, json=custom_format)
+                url = f'{self.url_customformat}/{custom_format["id"]}'
+                response = self.session.put(url, data=orjson.dumps(custom_format), headers=JSON_HEADERS)
             else:
-                url = f'{self.base_url}/api/v3/customformat'
-                response = self.session.post(url, json=custom_format)
+                url = self.url_customformat
+                response = self.session.post(url, data=orjson.dumps(custom_format), headers=JSON_HEADERS)
 
-            logging.debug(f"Payload being sent: {json.dumps(custom_format, indent=2)}")
+            logging.debug("Payload being sent: %s", LazyJSON(custom_format))
             response.raise_for_status()
-            return response.json()
+            synced_format = orjson.loads(response.content)
+            if self.formats_by_name is not None:
+                self.formats_by_name[synced_format['name']] = synced_format
+            if 'id' not in custom_format:
+                # The server adds every new custom format to all quality profiles
+                self.invalidate_profiles()
+            return synced_format
         except requests.RequestException as e:
             logging.error(f"Error updating custom format: {e}")
             logging.error(f"Response status code: {response.status_code if 'response' in locals() else 'No response'}")
@@ -91,10 +292,14 @@ class APIClient:
 
     # Retrieves all quality profiles from the instance
     def get_quality_profiles(self) -> List[Dict]:
+        if self.profiles is not None:
+            return self.profiles
+
         try:
-            response = self.session.get(f'{self.base_url}/api/v3/qualityprofile')
-            response.raise_for_status()
-            return response.json()
+            self.profiles = orjson.loads(self.get_conditional(self.url_qualityprofile))
+            for profile in self.profiles:
+                self.index_format_items(profile)
+            return self.profiles
         except requests.RequestException as e:
             logging.error(f"Error fetching quality profiles: {e}")
             raise
@@ -102,212 +307,368 @@ class APIClient:
     # Updates a specific quality profile
     def update_quality_profile(self, profile: Dict) -> Dict:
         try:
-            url = f'{self.base_url}/api/v3/qualityprofile/{profile["id"]}'
-            response = self.session.put(url, json=profile)
+            url = f'{self.url_qualityprofile}/{profile["id"]}'
+            response = self.session.put(url, data=orjson.dumps(profile), headers=JSON_HEADERS)
             response.raise_for_status()
-            return response.json()
+            updated_profile = orjson.loads(response.content)
+            with self.profiles_lock:
+                if self.profiles is not None:
+                    self.profiles = [updated_profile if p['id'] == updated_profile['id'] else p for p in self.profiles]
+                    self.index_format_items(updated_profile)
+            return updated_profile
         except requests.RequestException as e:
             logging.error(f"Error updating quality profile: {e}")
+            # The cached copy may hold the score we failed to write
+            self.invalidate_profiles()
             raise
 
 # Manages the synchronization of custom formats
 class CustomFormatSyncer:
-    def __init__(self, custom_formats_dir: str):
+    def __init__(self, custom_formats_dir: str, cache_dir: Optional[str] = None):
         self.custom_formats_dir = custom_formats_dir
+        self.cache_dir = cache_dir
         self.version_manager = VersionManager()
 
-    # Loads all custom format JSON files from the specified directory
-    def load_custom_formats(self) -> Dict[str, Dict]:
-        custom_formats = {}
+    # Lists the custom format JSON files in the specified directory, by filename
+    def list_custom_formats(self) -> Dict[str, str]:
         try:
-            for filename in os.listdir(self.custom_formats_dir):
-                if filename.endswith('.json'):
-                    with open(os.path.join(self.custom_formats_dir, filename), 'r') as f:
-                        custom_formats[filename] = json.load(f)
-            return custom_formats
-        except json.JSONDecodeError as e:
-            logging.error(f"Error parsing custom format file {filename}: {str(e)}")
+            with os.scandir(self.custom_formats_dir) as entries:
+                # The template is documentation only and never synced
+                return {
+                    entry.name: entry.path for entry in entries
+                    if entry.name.endswith('.json') and entry.name != '_template.json' and entry.is_file()
+                }
+        except Exception as e:
+            logging.error(f"Error loading custom formats: {str(e)}")
+            raise
+
+    # Loads the given custom format JSON files (all files in the directory by default)
+    def load_custom_formats(self, paths: Optional[Dict[str, str]] = None) -> Dict[str, Dict]:
+        if paths is None:
+            paths = self.list_custom_formats()
+        try:
+            # Reading is I/O-bound, so overlap the reads (helps on cold caches and network mounts)
+            with ThreadPoolExecutor(max_workers=8) as executor:
+                return dict(zip(paths, executor.map(self.load_custom_format, paths.values())))
+        except orjson.JSONDecodeError:
             raise
         except Exception as e:
             logging.error(f"Error loading custom formats: {str(e)}")
             raise
 
-    def sync_custom_formats(self, instances: List[Tuple[str, str, str]]):
+    # Reads a custom format file's cfSync_version from the start of the file, or None if it isn't found there
+    def scan_custom_format_version(self, path: str) -> Optional[str]:
+        with open(path, 'rb') as f:
+            match = VERSION_FIELD_PATTERN.search(f.read(VERSION_SCAN_BYTES))
+        return match.group(1).decode() if match else None
+
+    # Loads a single custom format JSON file
+    def load_custom_format(self, path: str) -> Dict:
+        try:
+            with open(path, 'rb') as f:
+                return orjson.loads(f.read())
+        except orjson.JSONDecodeError as e:
+            logging.error(f"Error parsing custom format file {os.path.basename(path)}: {str(e)}")
+            raise
+
+    def sync_custom_formats(self, instances: List[Tuple[str, str, str, str]]):
         try:
-            custom_formats = self.load_custom_formats()
-            if not custom_formats:
+            paths = self.list_custom_formats()
+            if not paths:
                 logging.warning("No custom formats found to sync")
                 return
 
             # Clean up versions for non-existent files
-            self.version_manager.cleanup_versions(list(custom_formats.keys()))
-            
-            # Find the latest version across all formats
-            latest_version = semver.VersionInfo.parse('0.0.0')
-            for filename, format_data in custom_formats.items():
-                if filename == '_template.json':
-                    continue
+            self.version_manager.cleanup_versions(list(paths.keys()))
+
+            # Only the versions are needed to decide what to sync, so read just those first; files whose
+            # version can't be picked out of their first bytes are parsed in full
+            with ThreadPoolExecutor(max_workers=8) as executor:
+                scanned_versions = dict(zip(paths, executor.map(self.scan_custom_format_version, paths.values())))
+            custom_formats: Dict[str, Dict] = self.load_custom_formats(
+                {filename: paths[filename] for filename, version in scanned_versions.items() if version is None}
+            )
+
+            # Parse every file's version once; files with invalid versions are left out
+            parsed_versions: Dict[str, semver.VersionInfo] = {}
+            for filename, version in scanned_versions.items():
+                if version is None:
+                    version = custom_formats[filename].get('cfSync_version', '0.0.0')
                 try:
-                    version = semver.VersionInfo.parse(format_data.get('cfSync_version', '0.0.0'))
-                    if version > latest_version:
-                        latest_version = version
+                    parsed_versions[filename] = parse_version(version)
                 except ValueError as e:
-                    logging.error(f"Invalid version in {filename}: {str(e)}")
+                    logging.error("Invalid version in %s: %s", filename, e)
                     continue
-            
-            for filename, format_data in custom_formats.items():
+
+            # Find the latest version across all formats
+            latest_version = max(parsed_versions.values(), default=ZERO_VERSION)
+            stored_versions = self.version_manager.versions
+
+            # Sync if:
+            # 1. File version is newer than stored version
+            # 2. File version is behind latest version (needs alignment)
+            needs_sync = []
+            for filename, file_version in parsed_versions.items():
+                if file_version > stored_versions.get(filename, ZERO_VERSION) or file_version < latest_version:
+                    needs_sync.append(filename)
+                else:
+                    logging.info("No updates needed for %s (current: %s)", filename, file_version)
+
+            # Up-to-date files are never parsed in full
+            custom_formats.update(self.load_custom_formats(
+                {filename: paths[filename] for filename in needs_sync if filename not in custom_formats}
+            ))
+
+            # Work out which files need syncing before contacting any instance
+            pending: List[PendingFormat] = []
+            for filename in needs_sync:
                 try:
-                    # Skip template file
-                    if filename == '_template.json':
-                        logging.info("Skipping _template.json")
+                    format_data = custom_formats[filename]
+                    file_version = parsed_versions[filename]
+                    if file_version < latest_version:
+                        logging.warning("%s version %s is behind latest version %s", filename, file_version, latest_version)
+
+                    # Normalize the instance allowlist once per file rather than once per instance;
+                    # a plain string is left alone so it keeps matching by substring as before
+                    allowed_instances = format_data.get('cfSync_instances')
+                    if allowed_instances is not None and not isinstance(allowed_instances, str):
+                        allowed_instances = frozenset(allowed_instances)
+
+                    # The prepared payload and its hash are the same for every instance, so build them once
+                    formatted_custom_format = self.prepare_format_for_sync(format_data)
+                    if not self.normalize_specifications(formatted_custom_format):
+                        logging.error("Skipping %s: its specifications could not be prepared for syncing", filename)
                         continue
+                    format_hash = self.hash_format(formatted_custom_format, format_data.get('cfSync_score'))
 
-                    file_version = semver.VersionInfo.parse(format_data.get('cfSync_version', '0.0.0'))
-                    stored_version = self.version_manager.versions.get(filename, semver.VersionInfo.parse('0.0.0'))
-
-                    # Sync if:
-                    # 1. File version is newer than stored version
-                    # 2. File version is behind latest version (needs alignment)
-                    if file_version > stored_version or file_version < latest_version:
-                        if file_version < latest_version:
-                            logging.warning(f"{filename} version {file_version} is behind latest version {latest_version}")
-                        
-                        for instance_name, url, api_key in instances:
-                            if not self.should_sync_to_instance(format_data, instance_name):
-                                logging.info(f"Skipping {filename} for {instance_name} based on cfSync settings")
-                                continue
-
-                            client = APIClient(url, api_key)
-                            try:
-                                existing_formats = client.get_custom_formats()
-                                formatted_custom_format = self.prepare_format_for_sync(format_data)
-                                synced_format = self.sync_format(client, existing_formats, formatted_custom_format)
-                                
-                                if synced_format and 'cfSync_score' in format_data:
-                                    self.sync_format_score(client, synced_format, format_data['cfSync_score'])
-                                
-                                logging.info(f"Synced {filename} to {instance_name}")
-                            except requests.RequestException as e:
-                                logging.error(f"Error syncing {filename} to {instance_name}: {str(e)}")
-                                continue
-                        
-                        self.version_manager.update_version(filename, file_version)
-                        logging.info(f"Updated {filename} to version {file_version}")
-                    else:
-                        logging.info(f"No updates needed for {filename} (current: {file_version})")
+                    pending.append((filename, format_data, file_version, allowed_instances, formatted_custom_format, format_hash))
 
-                except ValueError as e:
-                    logging.error(f"Invalid version format in {filename}: {str(e)}")
-                    continue
                 except Exception as e:
-                    logging.error(f"Error processing {filename}: {str(e)}")
+                    logging.error("Error processing %s: %s", filename, e)
                     continue
 
+            if not pending:
+                return
+
+            # Each instance works through all pending files on its own client, concurrently with the other instances
+            failed_files = set()
+            with ThreadPoolExecutor(max_workers=len(instances)) as executor:
+                futures = {
+                    executor.submit(self.sync_instance, APIClient(url, api_key, self.cache_dir), instance_name, instance_type, pending): instance_name
+                    for instance_name, url, api_key, instance_type in instances
+                }
+                # Collect every instance's outcome, so one failing worker can't skip the bookkeeping for the rest
+                for future, instance_name in futures.items():
+                    try:
+                        failed_files.update(future.result())
+                    except Exception as e:
+                        # It's unknown how far this instance got, so none of its files count as synced
+                        logging.error("Error syncing %s: %s", instance_name, e)
+                        failed_files.update(filename for filename, *_ in pending)
+
+            # A file's version is recorded once every instance has had a chance to sync it
+            for filename, _, file_version, _, _, _ in pending:
+                if filename in failed_files:
+                    continue
+                self.version_manager.set_version(filename, file_version)
+                logging.info("Updated %s to version %s", filename, file_version)
+
         except Exception as e:
-            logging.error(f"An error occurred during sync process: {str(e)}")
+            logging.error("An error occurred during sync process: %s", e)
             raise
+        finally:
+            self.version_manager.flush()
+
+    # Syncs all pending custom format files to one instance, returning the files that failed unexpectedly
+    def sync_instance(self, client: APIClient, instance_name: str, instance_type: str,
+                      pending: List[PendingFormat]) -> List[str]:
+        # Extract the instance number (e.g., "003" from "Radarr_003") once for the cfSync_instances checks
+        instance_number = instance_name.rsplit('_', 1)[-1]
+
+        # Drop files excluded by cfSync settings or unchanged since the last sync before contacting the instance
+        to_sync = []
+        for filename, format_data, file_version, allowed_instances, formatted_custom_format, format_hash in pending:
+            if not self.should_sync_to_instance(format_data, allowed_instances, instance_name, instance_number, instance_type):
+                logging.info("Skipping %s for %s based on cfSync settings", filename, instance_name)
+                continue
+
+            # The hash only short-circuits re-aligning files behind the latest version; an explicit
+            # version bump always reaches the instance (stored versions aren't updated until all instances finish)
+            if (file_version <= self.version_manager.versions.get(filename, ZERO_VERSION)
+                    and self.version_manager.get_hash(filename, instance_name) == format_hash):
+                logging.info("%s is unchanged since the last sync to %s, skipping", filename, instance_name)
+                continue
+
+            to_sync.append((filename, format_data, formatted_custom_format, format_hash))
+
+        if not to_sync:
+            return []
+
+        # Existing custom formats are fetched once; the client keeps them up to date as files are synced
+        # Anything can go wrong here (an HTML login page instead of JSON, a malformed format, ...); it only
+        # affects this instance, so it must not stop the others
+        try:
+            client.get_custom_formats()
+        except Exception as e:
+            logging.error("Error fetching custom formats from %s: %s", instance_name, e)
+            return []
+
+        failed_files = []
+        for filename, format_data, formatted_custom_format, format_hash in to_sync:
+            try:
+                self.sync_to_instance(client, filename, format_data, formatted_custom_format, format_hash, instance_name)
+            except Exception as e:
+                logging.error("Error processing %s for %s: %s", filename, instance_name, e)
+                failed_files.append(filename)
+        return failed_files
+
+    # Syncs a single custom format file to one instance
+    def sync_to_instance(self, client: APIClient, filename: str, format_data: Dict,
+                         formatted_custom_format: Dict, format_hash: str, instance_name: str):
+        try:
+            # Shallow copy: sync_format sets the instance-specific id, the specifications are shared read-only
+            synced_format = self.sync_format(client, dict(formatted_custom_format))
+
+            if synced_format and 'cfSync_score' in format_data:
+                self.sync_format_score(client, synced_format, format_data['cfSync_score'])
+
+            self.version_manager.set_hash(filename, instance_name, format_hash)
+            logging.info("Synced %s to %s", filename, instance_name)
+        except requests.RequestException as e:
+            logging.error("Error syncing %s to %s: %s", filename, instance_name, e)
 
     # Determines if a custom format should be synced to a specific instance
-    def should_sync_to_instance(self, format_data: Dict, instance_name: str) -> bool:
-        if 'cfSync_instances' in format_data:
-            # Extract the instance number (e.g., "003" from "Radarr_003")
-            instance_number = instance_name.split('_')[-1]
-            return instance_name in format_data['cfSync_instances'] or instance_number in format_data['cfSync_instances']
+    def should_sync_to_instance(self, format_data: Dict, allowed_instances: Optional[Collection[str]],
+                                instance_name: str, instance_number: str, instance_type: str) -> bool:
+        if allowed_instances is not None:
+            return instance_name in allowed_instances or instance_number in allowed_instances
         else:
-            # Determine if it's a Radarr or Sonarr instance
-            instance_type = 'radarr' if 'Radarr' in instance_name else 'sonarr'
+            # Fall back to the per-application toggle (cfSync_radarr / cfSync_sonarr)
             return format_data.get(f'cfSync_{instance_type}', True)
 
     # Prepares a custom format for syncing by extracting relevant fields
     def prepare_format_for_sync(self, format_data: Dict) -> Dict:
-        # Extract only the necessary fields for syncing
+        # Extract only the necessary fields for syncing; specifications are copied so that
+        # normalize_specifications doesn't rewrite the loaded file data
         return {
             "name": format_data.get("name"),
             "includeCustomFormatWhenRenaming": format_data.get("includeCustomFormatWhenRenaming", False),
-            "specifications": format_data.get("specifications", [])
+            "specifications": [dict(spec) for spec in format_data.get("specifications", [])]
         }
 
-    # Syncs a single custom format to an instance
-    def sync_format(self, client: APIClient, existing_formats: List[Dict], new_format: Dict) -> Dict:
-        existing_format = next((f for f in existing_formats if f['name'] == new_format['name']), None)
-        
-        # Ensure correct format for specifications
-        for spec in new_format.get('specifications', []):
-            if isinstance(spec.get('fields'), dict):
-                spec['fields'] = [{"name": "value", "value": spec['fields']['value']}]
-            elif isinstance(spec.get('fields'), list):
+    # Computes a stable hash of everything we push for a custom format, including its score
+    def hash_format(self, formatted_format: Dict, score: Optional[int] = None) -> str:
+        return canonical_hash({'format': formatted_format, 'score': score})
+
+    # Checks whether an existing custom format already has everything we would push. Only the fields we
+    # set are compared, since the server adds its own (ids, labels, help text, ...) to every specification.
+    def format_matches(self, new_format: Dict, existing_format: Dict) -> bool:
+        if any(existing_format.get(key) != new_format.get(key) for key in ('name', 'includeCustomFormatWhenRenaming')):
+            return False
+
+        new_specs = sorted(new_format.get('specifications', []), key=lambda spec: str(spec.get('name')))
+        existing_specs = sorted(existing_format.get('specifications', []), key=lambda spec: str(spec.get('name')))
+        if len(new_specs) != len(existing_specs):
+            return False
+
+        for new_spec, existing_spec in zip(new_specs, existing_specs):
+            if any(existing_spec.get(key) != value for key, value in new_spec.items() if key != 'fields'):
+                return False
+            existing_fields = {field.get('name'): field.get('value') for field in existing_spec.get('fields', [])}
+            for field in new_spec.get('fields', []):
+                if not isinstance(field, dict) or existing_fields.get(field.get('name')) != field.get('value'):
+                    return False
+
+        return True
+
+    # Converts specification fields to the list of {name, value} the API expects; returns False if a specification can't be converted
+    def normalize_specifications(self, formatted_format: Dict) -> bool:
+        for spec in formatted_format.get('specifications', []):
+            # The loaded JSON only ever holds plain dicts and lists, so exact type checks are enough
+            fields = spec.get('fields')
+            fields_type = type(fields)
+            if fields_type is dict:
+                spec['fields'] = [{"name": "value", "value": fields['value']}]
+            elif fields_type is list:
                 spec['fields'] = [
-                    {"name": field.get('name', 'value'), "value": field.get('value')} if isinstance(field, dict) else field
-                    for field in spec['fields']
+                    {"name": field.get('name', 'value'), "value": field.get('value')} if type(field) is dict else field
+                    for field in fields
                 ]
             else:
-                logging.error(f"Invalid fields format for specification: {spec}")
-                return None
-        
-        logging.info(f"Attempting to sync custom format: {json.dumps(new_format, indent=2)}")
+                logging.error("Invalid fields format for specification: %s", spec)
+                return False
+        return True
+
+    # Syncs a single custom format to an instance
+    def sync_format(self, client: APIClient, new_format: Dict) -> Dict:
+        existing_format = client.get_custom_format(new_format['name'])
+
+        logging.debug("Attempting to sync custom format: %s", LazyJSON(new_format))
 
         try:
             if existing_format:
                 new_format['id'] = existing_format['id']
-                if new_format != existing_format:
+                if not self.format_matches(new_format, existing_format):
                     updated_format = client.update_custom_format(new_format)
-                    logging.info(f"Updated custom format: {updated_format['name']}")
+                    logging.info("Updated custom format: %s", updated_format['name'])
                     return updated_format
+                # Still hand back the format so its score is synced even when nothing else changed
+                logging.info("Custom format already up to date: %s", existing_format['name'])
+                return existing_format
             else:
                 created_format = client.update_custom_format(new_format)
-                logging.info(f"Created new custom format: {created_format['name']}")
+                logging.info("Created new custom format: %s", created_format['name'])
                 return created_format
         except requests.RequestException as e:
-            logging.error(f"Failed to sync custom format {new_format['name']}: {str(e)}")
+            logging.error("Failed to sync custom format %s: %s", new_format['name'], e)
             raise
-        
-        return None
 
     # Updates the score of a custom format in all quality profiles
     def sync_format_score(self, client: APIClient, custom_format: Dict, score: int):
         try:
-            profiles = client.get_quality_profiles()
-            for profile in profiles:
-                updated = False
-                for format_item in profile.get('formatItems', []):
-                    if format_item['format'] == custom_format['id']:
-                        if format_item['score'] != score:
-                            format_item['score'] = score
-                            updated = True
-                
-                if updated:
-                    client.update_quality_profile(profile)
-                    logging.info(f"Updated score for {custom_format['name']} in profile {profile['name']}")
+            to_update = []
+            for profile in client.get_quality_profiles():
+                format_item = client.get_format_item(profile['id'], custom_format['id'])
+                if format_item and format_item['score'] != score:
+                    format_item['score'] = score
+                    to_update.append(profile)
+
+            # Each profile is its own resource, so the updates can go out concurrently. All of them are waited
+            # for before any error is raised, so none is still in flight when the next file updates the same profile.
+            futures = [PROFILE_UPDATE_EXECUTOR.submit(client.update_quality_profile, profile) for profile in to_update]
+            wait(futures)
+            for future in futures:
+                if future.exception() is None:
+                    logging.info("Updated score for %s in profile %s", custom_format['name'], future.result()['name'])
+            for future in futures:
+                if future.exception() is not None:
+                    raise future.exception()
         
         except requests.RequestException as e:
-            logging.error(f"Error syncing format score: {str(e)}")
+            logging.error("Error syncing format score: %s", e)
             raise
 
+# Matches instance settings such as RADARR_001_URL or SONARR_002_API_KEY
+INSTANCE_ENV_PATTERN = re.compile(r'^(RADARR|SONARR)_(\d{3})_(URL|API_KEY)$')
+
 # Main execution function
 def main():
     custom_formats_dir = 'custom_formats'
     
-    instances = []
-    
-    # Dynamically load Radarr instances
-    radarr_count = 1
-    while True:
-        url = os.environ.get(f'RADARR_{radarr_count:03d}_URL')
-        api_key = os.environ.get(f'RADARR_{radarr_count:03d}_API_KEY')
-        if not url or not api_key:
-            break
-        instances.append((f'Radarr_{radarr_count:03d}', url, api_key))
-        radarr_count += 1
-    
-    # Dynamically load Sonarr instances
-    sonarr_count = 1
-    while True:
-        url = os.environ.get(f'SONARR_{sonarr_count:03d}_URL')
-        api_key = os.environ.get(f'SONARR_{sonarr_count:03d}_API_KEY')
-        if not url or not api_key:
-            break
-        instances.append((f'Sonarr_{sonarr_count:03d}', url, api_key))
-        sonarr_count += 1
+    # Dynamically load Radarr and Sonarr instances in a single pass over the environment;
+    # numbering may have gaps (e.g. RADARR_001 and RADARR_003)
+    instance_env = {}
+    for key, value in os.environ.items():
+        match = INSTANCE_ENV_PATTERN.match(key)
+        if match:
+            kind, number, field = match.groups()
+            instance_env.setdefault((kind, number), {})[field] = value
+
+    instances = sorted(
+        (f'{kind.title()}_{number}', config['URL'], config['API_KEY'], kind.lower())
+        for (kind, number), config in instance_env.items()
+        if config.get('URL') and config.get('API_KEY')
+    )
     
     # Debugging statements to ensure environment variables are correctly parsed
     for instance in instances:
@@ -317,7 +678,10 @@ def main():
         logging.error("No Radarr or Sonarr instances configured. Please check your environment variables.")
         sys.exit(1)
 
-    syncer = CustomFormatSyncer(custom_formats_dir)
+    # Responses are cached between runs so unchanged lists can be fetched with conditional GETs
+    cache_dir = os.path.join(os.environ.get('XDG_CACHE_HOME') or os.path.expanduser('~/.cache'), 'servarr-cf-sync')
+
+    syncer = CustomFormatSyncer(custom_formats_dir, cache_dir)
     try:
         syncer.sync_custom_formats(instances)
     except Exception as e: